@@ -6,40 +6,71 @@ from pathlib import Path, PurePath
 # ----------------- CONFIG -----------------
 PRESET = "13"
 HLS_TIME = 4
-LADDER = {
+# Paliers par largeur (--ladder-mode width, défaut) ou par hauteur (--ladder-mode height)
+LADDER_WIDTH = {
     "480p": 854,
     "720p": 1280,
     "1080p": 1920,
     "1440p": 2560,
     "2160p": 3840
 }
-BITRATES = {
-    "480p": "450k",
-    "720p": "900k",
-    "1080p": "1800k",
-    "1440p": "4500k",
-    "2160p": "8100k"
+LADDER_HEIGHT = {
+    "480p": 480,
+    "720p": 720,
+    "1080p": 1080,
+    "1440p": 1440,
+    "2160p": 2160
+}
+# Réglages SVT-AV1 par qualité : débit, preset, tuiles (log2 colonnes / lignes),
+# lookahead en images (None = défaut de l'encodeur).
+# Les tuiles parallélisent l'encodage des grandes images ; lp vient du budget
+# de threads calculé à l'exécution selon le nombre d'encodes simultanés.
+# Les petites qualités gagnent peu à une longue analyse : lookahead réduit.
+PROFILES = {
+    "480p":  {"bitrate": "450k",  "preset": PRESET, "tile_cols": 0, "tile_rows": 0, "lookahead": 16},
+    "720p":  {"bitrate": "900k",  "preset": PRESET, "tile_cols": 0, "tile_rows": 0, "lookahead": 16},
+    "1080p": {"bitrate": "1800k", "preset": PRESET, "tile_cols": 1, "tile_rows": 0, "lookahead": None},
+    "1440p": {"bitrate": "4500k", "preset": PRESET, "tile_cols": 1, "tile_rows": 1, "lookahead": None},
+    "2160p": {"bitrate": "8100k", "preset": PRESET, "tile_cols": 2, "tile_rows": 1, "lookahead": None}
 }
 AUDIO_BITRATE = "128k"
+USE_HWACCEL = True  # décodage matériel de la source si disponible (l'encodage reste SVT-AV1)
+USE_HWSCALE = True  # redimensionnement sur GPU (cuda/qsv/vaapi) dans la commande unique, repli logiciel
+VERBOSE = sys.stdout.isatty()  # affiche les commandes ffmpeg (désactivé hors terminal)
 INPUT_DIR = Path("input")
 OUTPUT_DIR = Path("output")
 # ------------------------------------------
 
+import argparse
+import collections
 import subprocess
 import json
+import functools
 import os
-import shlex
 import re
+import shlex
+import shutil
 import time
+import asyncio
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 
-# Si un fichier est passé en argument → on encode seulement celui-là
-if len(sys.argv) > 1:
-    input_files = [Path(sys.argv[1])]
-else:
-    input_files = list(INPUT_DIR.glob("*"))
+# orjson (optionnel) parse le JSON ffprobe 2 à 5x plus vite
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
 # ------------------------------------------
 
+# CPUs réellement utilisables par ce process (affinité / cgroups)
+try:
+    AVAILABLE_CPUS = len(os.sched_getaffinity(0))
+except AttributeError:
+    # macOS / Windows : pas de sched_getaffinity
+    AVAILABLE_CPUS = os.cpu_count() or 1
+
 # ---------- COULEURS & HELPERS ----------
 # Palette ANSI (confirmée)
 CLR_RESET  = "\033[0m"
@@ -53,24 +84,60 @@ CLR_PCT    = "\033[97m"   # blanc pour pourcentage
 CLR_ETA    = "\033[95m"   # magenta pour ETA
 CLR_SPEED  = "\033[92m"   # vert pour vitesse
 
+# intervalle minimal entre deux rafraîchissements de la barre (250 ms)
+THROTTLE_NS = 250_000_000
+
 # largeur d'alignement des labels (pour logs alignés)
 LOG_LABEL_WIDTH = 30  # ajuste si tu veux plus court/long
 
+@functools.lru_cache(maxsize=256)
+def padded_label(label):
+    """Label aligné à LOG_LABEL_WIDTH (mémorisé, les mêmes labels reviennent souvent)."""
+    return label.ljust(LOG_LABEL_WIDTH)
+
+# lignes des threads d'arrière-plan mises de côté (voir defer_background_logs)
+_DEFERRED_LOGS = None
+
+def emit(line):
+    """
+    Affiche une ligne de log, ou la met de côté si elle vient d'un thread
+    d'arrière-plan pendant que le thread principal dessine sa progression.
+    """
+    if _DEFERRED_LOGS is not None and threading.current_thread() is not threading.main_thread():
+        _DEFERRED_LOGS.append(line)
+    else:
+        print(line)
+
+@contextlib.contextmanager
+def defer_background_logs():
+    """
+    Pendant le bloc, les logs des autres threads sont retenus (un board
+    redessiné en remontant le curseur les écraserait), puis affichés à la fin.
+    """
+    global _DEFERRED_LOGS
+    _DEFERRED_LOGS = []
+    try:
+        yield
+    finally:
+        lines, _DEFERRED_LOGS = _DEFERRED_LOGS, None
+        for line in lines:
+            print(line)
+
 def log_info(label, msg):
-    lbl = f"{CLR_INFO}▶ {label.ljust(LOG_LABEL_WIDTH)}{CLR_RESET}"
-    print(f"{lbl} {msg}")
+    lbl = f"{CLR_INFO}▶ {padded_label(label)}{CLR_RESET}"
+    emit(f"{lbl} {msg}")
 
 def log_ok(label, msg):
-    lbl = f"{CLR_OK}✔ {label.ljust(LOG_LABEL_WIDTH)}{CLR_RESET}"
-    print(f"{lbl} {msg}")
+    lbl = f"{CLR_OK}✔ {padded_label(label)}{CLR_RESET}"
+    emit(f"{lbl} {msg}")
 
 def log_warn(label, msg):
-    lbl = f"{CLR_WARN}⚠ {label.ljust(LOG_LABEL_WIDTH)}{CLR_RESET}"
-    print(f"{lbl} {msg}")
+    lbl = f"{CLR_WARN}⚠ {padded_label(label)}{CLR_RESET}"
+    emit(f"{lbl} {msg}")
 
 def log_err(label, msg):
-    lbl = f"{CLR_ERR}✖ {label.ljust(LOG_LABEL_WIDTH)}{CLR_RESET}"
-    print(f"{lbl} {msg}")
+    lbl = f"{CLR_ERR}✖ {padded_label(label)}{CLR_RESET}"
+    emit(f"{lbl} {msg}")
 
 def hms(seconds):
     seconds = int(round(seconds))
@@ -80,77 +147,217 @@ def hms(seconds):
     return f"{h:02d}:{m:02d}:{s:02d}"
 # ----------------------------------------
 
+# Les 41 barres possibles, construites une fois à l'import
+_BARS = tuple(
+    f"{CLR_BLOCK}{'█' * b}{CLR_RESET}{CLR_EMPTY}{'░' * (40 - b)}{CLR_RESET}"
+    for b in range(41)
+)
+
 def progress_bar_40(pct):
     """Barre 40 blocs : 1 bloc = 2.5%"""
-    bars = int(pct / 2.5)  # 100 / 2.5 = 40
-    if bars < 0: bars = 0
-    if bars > 40: bars = 40
-    filled = CLR_BLOCK + "█" * bars + CLR_RESET
-    empty  = CLR_EMPTY + "░" * (40 - bars) + CLR_RESET
-    return f"{filled}{empty}"
+    return _BARS[min(40, max(0, int(pct / 2.5)))]  # 100 / 2.5 = 40
 
-def run_ffmpeg_with_progress(cmd, total_duration, label):
+# Ligne de statut : label, pct, barre, elapsed, total, ETA, speed
+_STATUS_TEMPLATE = (
+    f"{{}} "
+    f"{CLR_PCT}{{:5.1f}}%{CLR_RESET} {{}}  "
+    f"{{}} / {{}}  {CLR_ETA}ETA:{{}}{CLR_RESET}  {CLR_SPEED}{{:.2f}}x{CLR_RESET}"
+)
+
+@functools.lru_cache(maxsize=None)
+def resolve_exe(name):
     """
-    Exécute ffmpeg avec -progress pipe:1 en affichant :
+    Chemin absolu de l'exécutable (ffmpeg/ffprobe), résolu une fois.
+    CPython n'utilise posix_spawn (pas de copie des tables de pages comme fork)
+    que si l'exécutable a un chemin explicite et close_fds=False (voir _CLOSE_FDS).
+    """
+    return shutil.which(name) or name
+
+# stdin des process lancés : /dev/null ouvert une fois (ffmpeg ne lit pas le terminal)
+_DEVNULL = open(os.devnull, "rb")
+# close_fds=True parcourt /proc/self/fd à chaque lancement sous Linux ;
+# nos fds sont non héritables (PEP 446), rien ne fuit vers ffmpeg
+_CLOSE_FDS = not sys.platform.startswith("linux")
+
+def _stringify(cmd):
+    """Convertit une seule fois les arguments (Path, int...) en str."""
+    args = [x if isinstance(x, str) else str(x) for x in cmd]
+    args[0] = resolve_exe(args[0])
+    return args
+
+def format_progress_line(lbl_padded, current_time, total_duration, elapsed):
+    """
+    Construit la ligne de statut :
      - % (white)
      - barre 40 blocs (cyan/gray)
      - elapsed / total (HH:MM:SS)
      - ETA (HH:MM:SS, magenta)
      - speed (x.xx, vert)
-    Label is left-aligned to LOG_LABEL_WIDTH.
+    lbl_padded est le label déjà aligné et coloré (calculé une fois par ffmpeg).
+    """
+    if total_duration and total_duration > 0:
+        pct = min(100.0, (current_time / total_duration) * 100.0)
+    else:
+        pct = 0.0
+
+    speed = (current_time / elapsed) if elapsed > 0 else 0.0
+    remaining = ((total_duration - current_time) / speed) if (total_duration and speed > 0) else 0.0
+    if remaining < 0: remaining = 0.0
+
+    total_str = hms(total_duration) if total_duration else "??:??:??"
+
+    return _STATUS_TEMPLATE.format(
+        lbl_padded, pct, progress_bar_40(pct),
+        hms(current_time), total_str, hms(remaining), speed
+    )
+
+class ProgressBoard:
+    """
+    Bloc multi-lignes (une ligne par label) redessiné en place,
+    pour suivre plusieurs ffmpeg lancés en même temps.
+    """
+    def __init__(self, labels):
+        self.labels = list(labels)
+        self.lines = {
+            label: f"{CLR_INFO}{padded_label(label)}{CLR_RESET} en attente..."
+            for label in self.labels
+        }
+        self.last_ns = dict.fromkeys(self.labels, 0)
+        self.drawn_ns = 0
+        self.drawn = False
+
+    def due(self, label, now_ns):
+        return now_ns - self.last_ns[label] > THROTTLE_NS
+
+    def update(self, label, line, now_ns, force=False):
+        self.lines[label] = line
+        self.last_ns[label] = now_ns
+        if force or now_ns - self.drawn_ns > THROTTLE_NS:
+            self.draw()
+            self.drawn_ns = now_ns
+
+    def draw(self):
+        parts = []
+        if self.drawn:
+            # remonter au début du bloc déjà affiché
+            parts.append(f"\033[{len(self.labels)}F")
+        for label in self.labels:
+            parts.append(f"\033[2K{self.lines[label]}\n")
+        if not self.drawn:
+            sys.stdout.flush()
+        sys.stdout.buffer.write("".join(parts).encode())
+        sys.stdout.buffer.flush()
+        self.drawn = True
+
+# étapes lancées en arrière-plan (thread) : pas de barre, seulement les logs de fin
+_PROGRESS_STATE = threading.local()
+# barres coupées pour tout le process (worker de scan_to_encode, voir hide_progress)
+_PROGRESS_OFF = False
+
+def progress_hidden():
+    return _PROGRESS_OFF or getattr(_PROGRESS_STATE, "hidden", False)
+
+def hide_progress():
+    """
+    Coupe les barres de progression de tout le process : plusieurs process
+    qui dessinent sur le même terminal se mélangent. Les logs restent.
+    """
+    global _PROGRESS_OFF
+    _PROGRESS_OFF = True
+
+def run_in_background(fn, *args):
+    """
+    Exécute fn(*args) sans barre de progression, pour un thread qui tourne
+    pendant qu'un autre ffmpeg affiche la sienne.
+    """
+    previous = getattr(_PROGRESS_STATE, "hidden", False)
+    _PROGRESS_STATE.hidden = True
+    try:
+        return fn(*args)
+    finally:
+        _PROGRESS_STATE.hidden = previous
+
+async def run_ffmpeg_with_progress_async(cmd, total_duration, label, board=None):
+    """
+    Exécute ffmpeg avec -progress pipe:1 et affiche la progression
+    (ligne \r seule, ou ligne du board si plusieurs ffmpeg tournent).
     Raises CalledProcessError on non-zero return.
     """
-    # safe pretty print of command
-    pretty = shlex.join([str(x) for x in cmd])
-    log_info(label, f"{pretty}")
-
-    # start process
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
-
-    start = time.time()
-    current_time = 0.0
-    last_print = 0.0
-
-    # parse lines like: out_time_ms=1234567
-    out_time_re = re.compile(r"out_time_ms=(\d+)")
-    for raw in proc.stdout:
-        line = raw.strip()
-        m = out_time_re.match(line)
-        if m:
-            current_time = int(m.group(1)) / 1_000_000.0
-
-            if total_duration and total_duration > 0:
-                pct = min(100.0, (current_time / total_duration) * 100.0)
-            else:
-                pct = 0.0
-
-            elapsed = time.time() - start
-            speed = (current_time / elapsed) if elapsed > 0 else 0.0
-            remaining = ((total_duration - current_time) / speed) if (total_duration and speed > 0) else 0.0
-            if remaining < 0: remaining = 0.0
-
-            # throttle prints so terminal isn't overwhelmed (e.g. 5x / sec)
-            if time.time() - last_print > 0.2:
-                bar = progress_bar_40(pct)
-                pct_str = f"{CLR_PCT}{pct:5.1f}%{CLR_RESET}"
-                elapsed_str = hms(current_time)
-                total_str = hms(total_duration) if total_duration else "??:??:??"
-                eta_str = hms(remaining)
-                speed_str = f"{CLR_SPEED}{speed:.2f}x{CLR_RESET}"
-
-                #Aligned label
-                lbl = f"{label.ljust(LOG_LABEL_WIDTH)}"
-                sys.stdout.write(
-                    f"\r{CLR_INFO}{lbl}{CLR_RESET} "
-                    f"{pct_str} {bar}  "
-                    f"{elapsed_str} / {total_str}  {CLR_ETA}ETA:{eta_str}{CLR_RESET}  {speed_str}"
-                )
-                sys.stdout.flush()
-                last_print = time.time()
+    cmd = _stringify(cmd)
+    # safe pretty print of command (avec un board, run_many_with_progress l'a déjà fait)
+    if VERBOSE and board is None:
+        log_info(label, shlex.join(cmd))
+
+    # start process (pipe binaire : pas de décodage UTF-8 par ligne)
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdin=_DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        limit=65536, close_fds=_CLOSE_FDS, start_new_session=False
+    )
+
+    hidden = board is None and progress_hidden()
+    start_ns = time.monotonic_ns()
+    last_print_ns = 0
+    #Aligned label, calculé une seule fois
+    lbl_padded = f"{CLR_INFO}{padded_label(label)}{CLR_RESET}"
+    # les logs texte doivent sortir avant les écritures binaires de la barre
+    sys.stdout.flush()
+    out = sys.stdout.buffer
+
+    # lecture par blocs : seule la dernière valeur out_time_ms=1234567 compte,
+    # les précédentes du même bloc sont déjà périmées
+    pending = b""
+    while True:
+        chunk = await proc.stdout.read(65536)
+        if not chunk:
+            break
+        buf = pending + chunk
+        cut = buf.rfind(b"\n")
+        if cut == -1:
+            pending = buf
+            continue
+        pending = buf[cut + 1:]
+        if hidden:
+            continue
+
+        # throttle prints so terminal isn't overwhelmed (e.g. 4x / sec)
+        now_ns = time.monotonic_ns()
+        if board is None:
+            if now_ns - last_print_ns <= THROTTLE_NS:
+                continue
+        elif not board.due(label, now_ns):
+            continue
+
+        pos = buf.rfind(b"out_time_ms=", 0, cut)
+        if pos == -1:
+            continue
+        try:
+            current_time = int(buf[pos + 12:buf.index(b"\n", pos)]) / 1_000_000.0
+        except ValueError:
+            # out_time_ms=N/A en début d'encodage
+            continue
+
+        line = format_progress_line(lbl_padded, current_time, total_duration, (now_ns - start_ns) / 1e9)
+        if board is None:
+            out.write(f"\r{line}".encode())
+            out.flush()
+            last_print_ns = now_ns
+        else:
+            board.update(label, line, now_ns)
+
+    await proc.wait()
+
+    if board is not None:
+        status = "terminé." if proc.returncode == 0 else f"ffmpeg failed (code {proc.returncode})"
+        clr = CLR_OK if proc.returncode == 0 else CLR_ERR
+        board.update(label, f"{clr}{padded_label(label)}{CLR_RESET} {status}",
+                     time.monotonic_ns(), force=True)
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+        return True
 
-    proc.wait()
     # ensure newline after progress
-    print()
+    if not hidden:
+        print()
 
     if proc.returncode != 0:
         log_err(label, f"ffmpeg failed (code {proc.returncode})")
@@ -160,48 +367,107 @@ def run_ffmpeg_with_progress(cmd, total_duration, label):
     log_ok(label, "terminé.")
     return True
 
+def run_ffmpeg_with_progress(cmd, total_duration, label):
+    """
+    Version synchrone de run_ffmpeg_with_progress_async (un seul ffmpeg).
+    """
+    return asyncio.run(run_ffmpeg_with_progress_async(cmd, total_duration, label))
+
+def run_many_with_progress(jobs, max_parallel=None):
+    """
+    Lance plusieurs ffmpeg en parallèle, jobs = liste de (cmd, total_duration, label).
+    Au plus max_parallel tournent en même temps (tous si None) : dès qu'un ffmpeg
+    se termine, le suivant démarre.
+    La progression est affichée en un bloc d'une ligne par label.
+    Retourne la liste des résultats (True ou l'exception levée), dans l'ordre des jobs.
+    """
+    if VERBOSE:
+        # commandes affichées avant le board pour ne pas décaler son rendu
+        for cmd, _, label in jobs:
+            log_info(label, shlex.join(_stringify(cmd)))
+
+    async def _gather():
+        board = None if progress_hidden() else ProgressBoard(label for _, _, label in jobs)
+        slots = asyncio.Semaphore(max(1, max_parallel or len(jobs)))
+
+        async def _one(cmd, duration, label):
+            async with slots:
+                return await run_ffmpeg_with_progress_async(cmd, duration, label, board)
+
+        return await asyncio.gather(
+            *(_one(cmd, duration, label) for cmd, duration, label in jobs),
+            return_exceptions=True
+        )
+    return asyncio.run(_gather())
+
+
+# nombre de lignes stderr conservées pour le diagnostic en cas d'échec
+RUN_STDERR_TAIL = 500
 
 def run(cmd, check=True):
     """
     Exécute la commande (liste d'arguments). Affiche la commande (sécurisée),
-    capture stdout/stderr et soulève une exception si erreur.
+    ignore stdout, garde seulement les dernières lignes de stderr
+    (mémoire bornée sur les longs encodes) et soulève une exception si erreur.
     """
+    cmd = _stringify(cmd)
     # Affichage lisible et sûr de la commande
-    pretty = shlex.join([str(x) for x in cmd])
-    print("▶", pretty)
+    if VERBOSE:
+        print("▶", shlex.join(cmd))
 
-    result = subprocess.run([str(x) for x in cmd],
-                            stdout=subprocess.PIPE,
+    proc = subprocess.Popen(cmd,
+                            stdin=_DEVNULL,
+                            stdout=subprocess.DEVNULL,
                             stderr=subprocess.PIPE,
-                            text=True)
-    if result.returncode != 0:
-        print("❌ FFmpeg/commande error (returncode={}):".format(result.returncode))
-        # Affiche stderr (FFmpeg)
-        if result.stderr:
-            print(result.stderr)
-        # Affiche stdout si utile
-        if result.stdout:
-            print(result.stdout)
-        raise subprocess.CalledProcessError(result.returncode, cmd)
-    return result
-
-def get_duration(input_file):
+                            text=True,
+                            close_fds=_CLOSE_FDS,
+                            start_new_session=False)
+    tail = collections.deque(proc.stderr, maxlen=RUN_STDERR_TAIL)
+    proc.wait()
+    if proc.returncode != 0:
+        print("❌ FFmpeg/commande error (returncode={}):".format(proc.returncode))
+        # Affiche la fin de stderr (FFmpeg)
+        if tail:
+            print("".join(tail))
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return subprocess.CompletedProcess(cmd, proc.returncode, None, "".join(tail))
+
+# uniquement les champs lus par le script (réduit la sortie JSON à parser)
+FFPROBE_ENTRIES = (
+    "format=duration"
+    ":stream=index,codec_type,codec_name,width,height,pix_fmt"
+    ":stream_tags=language,title,forced"
+    ":stream_disposition=forced"
+)
+
+@functools.lru_cache(maxsize=128)
+def _ffprobe_cached(path, mtime_ns):
+    # mtime_ns fait partie de la clé : un fichier réécrit est re-sondé
     cmd = [
-        "ffprobe", "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=nk=1:nw=1",
-        input_file
+        "ffprobe", "-v", "quiet",
+        "-print_format", "json",
+        "-show_entries", FFPROBE_ENTRIES,
+        path
     ]
+    p = subprocess.run(_stringify(cmd), stdin=_DEVNULL, capture_output=True, check=True,
+                       close_fds=_CLOSE_FDS, start_new_session=False)
+    return json_loads(p.stdout)
+
+def ffprobe_media(input_file):
+    """
+    Un seul appel ffprobe (format + streams) par fichier, mis en cache.
+    """
+    path = str(input_file)
+    return _ffprobe_cached(path, os.stat(path).st_mtime_ns)
+
+def get_duration(input_file):
     try:
-        out = subprocess.check_output(cmd, stderr=subprocess.STDOUT)
-        return float(out.decode().strip())
+        return float(ffprobe_media(input_file)["format"]["duration"])
     except:
         return None
 
 def ffprobe_streams(input_file):
-    cmd = ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_streams", str(input_file)]
-    p = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    return json.loads(p.stdout)["streams"]
+    return ffprobe_media(input_file)["streams"]
 
 def get_video_resolution(streams):
     for s in streams:
@@ -209,6 +475,20 @@ def get_video_resolution(streams):
             return int(s["width"]), int(s["height"])
     raise RuntimeError("Aucune piste vidéo trouvée")
 
+def pix_fmt_bit_depth(pix_fmt):
+    """
+    Profondeur (bits par composante) d'un pix_fmt ffmpeg :
+    yuv420p10le → 10, p010le → 10, yuv420p / nv12 → 8.
+    """
+    m = re.search(r"p(\d{2})(?:le|be)?$", pix_fmt) or re.match(r"p0(\d{2})", pix_fmt)
+    return int(m.group(1)) if m else 8
+
+def get_video_bit_depth(streams):
+    for s in streams:
+        if s.get("codec_type") == "video":
+            return pix_fmt_bit_depth(s.get("pix_fmt") or "")
+    return 8
+
 def select_audio_codec(stream):
     """
     Retourne le codec ffmpeg à utiliser selon le codec source.
@@ -247,10 +527,28 @@ def select_audio_codec(stream):
         "bitrate": "640k"
     }
 
+class _SanitizeTable(dict):
+    """
+    Table str.translate : garde alphanumériques, '-' et '_', remplace le reste par '_'.
+    Chaque code point est évalué une fois puis mis en cache dans le dict.
+    """
+    def __missing__(self, cp):
+        c = chr(cp)
+        value = cp if c.isalnum() or c in "-_" else ord("_")
+        self[cp] = value
+        return value
+
+_SANITIZE_TABLE = _SanitizeTable()
+# plage ASCII remplie dès le chargement : les noms ASCII (cas courant) passent
+# par le chemin rapide de str.translate sans jamais appeler __missing__
+for _cp in range(128):
+    _SANITIZE_TABLE[_cp]
+del _cp
+
 def sanitize(text):
     if not text:
         return ""
-    return "".join(c if c.isalnum() or c in "-_" else "_" for c in text)
+    return text.translate(_SANITIZE_TABLE)
 
 def normalize_lang_code(lang):
     """
@@ -309,39 +607,56 @@ def is_ad_audio(stream):
     ad_keywords = ["ad", "audio description", "descriptive", "dv", "dvs"]
     return any(keyword in title_lower for keyword in ad_keywords)
 
-def can_stream_copy_subtitle(codec_name):
+# Codecs texte que ffmpeg sait écrire directement en WebVTT (un seul process).
+# Les autres passent par le repli piste → SRT → WebVTT.
+SUBTITLE_CODEC_ARGS = {
+    "subrip":   ("-c:s", "webvtt"),
+    "srt":      ("-c:s", "webvtt"),
+    "ass":      ("-c:s", "webvtt"),
+    "ssa":      ("-c:s", "webvtt"),
+    "mov_text": ("-c:s", "webvtt"),
+    "text":     ("-c:s", "webvtt"),
+    "webvtt":   ("-c:s", "copy"),
+}
+
+def is_direct_subtitle(track):
     """
-    Retourne True si on peut raisonnablement tenter un copy → SRT.
+    True si la piste peut être écrite en WebVTT par un seul ffmpeg.
     """
-    if not codec_name:
-        return False
-    codec_name = codec_name.lower()
-    return codec_name in {"srt", "subrip", "text", "mov_text", "webvtt"}
+    return (track["codec"] or "").lower() in SUBTITLE_CODEC_ARGS
 
-def extract_all_subs(input_file, out_sub_dir, streams):
+def subtitle_output_args(track):
     """
-    Extrait toutes les pistes subtitle texte en VTT.
-    Utilise run_ffmpeg_with_progress pour afficher la progression.
-    Skip bitmap (PGS/DVD).
+    Arguments de sortie ffmpeg d'une piste : transcodage direct en WebVTT
+    (copy si déjà WebVTT). Vide si le codec n'est pas géré en direct.
     """
-    input_file = Path(input_file)
-    out_sub_dir = Path(out_sub_dir)
-    out_sub_dir.mkdir(parents=True, exist_ok=True)
+    codec_args = SUBTITLE_CODEC_ARGS.get((track["codec"] or "").lower())
+    if codec_args is None:
+        return []
+    return [
+        "-map", f"0:{track['entry']['index']}",
+        *codec_args,
+        "-max_muxing_queue_size", "1024",
+        str(track["out_vtt"])
+    ]
+
+def plan_subtitle_tracks(out_sub_dir, streams):
+    """
+    Sélectionne les pistes subtitle texte à extraire en VTT et calcule
+    leurs fichiers de sortie.
+    Skip SDH et bitmap (PGS/DVD).
+    """
+    if not out_sub_dir.is_dir():
+        out_sub_dir.mkdir(parents=True)
 
     subs = [s for s in streams if s.get("codec_type") == "subtitle"]
-    extracted = []
+    tracks = []
 
     UNSUPPORTED = {"hdmv_pgs_subtitle", "dvd_subtitle", "xsub", "dvb_subtitle"}
     
     # Compteur pour gérer les conflits de noms (même langue + même type)
     name_counter = {}
 
-    # obtenir la durée totale (pour calcul du %) - fallback None si échec
-    try:
-        total_duration = get_duration(str(input_file)) or 0.0
-    except:
-        total_duration = 0.0
-
     for s in subs:
         real_index = s.get("index")
         codec = s.get("codec_name", "")
@@ -396,103 +711,150 @@ def extract_all_subs(input_file, out_sub_dir, streams):
             fname = base_fname
         
         out_vtt = out_sub_dir / f"{fname}.vtt"
-        
-        # Pour le fichier temporaire SRT, utiliser un nom unique basé sur l'index
-        tmp_srt = out_sub_dir / f"temp_{real_index}.srt"
-
-        # 1) Tentative COPY (uniquement si codec compatible)
-        copy_success = False
-        if can_stream_copy_subtitle(codec):
-            cmd_copy = [
-                "ffmpeg", "-progress", "pipe:1", "-y",
-                "-i", str(input_file),
-                "-map", f"0:{real_index}",
-                "-c:s", "copy",
-                str(tmp_srt)
-            ]
-            try:
-                run_ffmpeg_with_progress(cmd_copy, total_duration, label=f"{label_base} (copy)")
-                if tmp_srt.exists() and tmp_srt.stat().st_size > 0:
-                    copy_success = True
-                else:
-                    log_warn(label_base, "copy terminé mais fichier vide → conversion nécessaire")
-            except subprocess.CalledProcessError:
-                log_warn(label_base, "copy échoué, tentative conversion SRT...")
-        else:
-            log_info(label_base, f"codec {codec} incompatible copy → conversion SRT directe")
-
-        if not copy_success:
-            # Conversion forcée vers SRT
-            log_info(label_base, "conversion vers SRT...")
-            cmd_force = [
-                "ffmpeg", "-progress", "pipe:1", "-y",
-                "-i", str(input_file),
-                "-map", f"0:{real_index}",
-                "-c:s", "srt",
-                str(tmp_srt)
-            ]
-            try:
-                run_ffmpeg_with_progress(cmd_force, total_duration, label=f"{label_base} (to SRT)")
-            except subprocess.CalledProcessError:
-                log_err(label_base, "conversion SRT échouée → skip")
-                if tmp_srt.exists():
-                    try: tmp_srt.unlink()
-                    except: pass
-                continue
 
-        # Vérifier que le SRT existe réellement
-        if not tmp_srt.exists() or tmp_srt.stat().st_size == 0:
-            log_err(label_base, "SRT introuvable ou vide après conversion → skip")
-            if tmp_srt.exists():
-                try: tmp_srt.unlink()
-                except: pass
-            continue
+        # Nom d'affichage pour le master playlist
+        display_name = f"{lang_code} {sub_type}" if lang_code != "UND" else f"Subtitle {sub_type}"
 
-        # 3) Convert SRT -> VTT (we can show progress using duration of file)
+        tracks.append({
+            "label": label_base,
+            "codec": codec,
+            "out_vtt": out_vtt,
+            "entry": {
+                "index": real_index,
+                "path": str(out_vtt),
+                "lang": lang or "",
+                "name": display_name,
+                "forced": is_forced
+            }
+        })
+
+    return tracks
+
+def convert_subtitle_via_srt_pipe(input_file, track):
+    """
+    Repli : ffmpeg (piste → SRT sur stdout) | ffmpeg (SRT sur stdin → WebVTT),
+    sans fichier intermédiaire ; les deux process tournent en même temps.
+    Retourne True si le VTT a bien été produit.
+    """
+    out_vtt = track["out_vtt"]
+    cmd_srt = _stringify([
+        "ffmpeg", "-nostdin", "-v", "error", "-y",
+        "-i", input_file,
+        "-map", f"0:{track['entry']['index']}",
+        "-c:s", "srt", "-f", "srt", "pipe:1"
+    ])
+    cmd_vtt = _stringify([
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "srt", "-i", "pipe:0",
+        "-c:s", "webvtt",
+        str(out_vtt)
+    ])
+    if VERBOSE:
+        log_info(track["label"], f"{shlex.join(cmd_srt)} | {shlex.join(cmd_vtt)}")
+
+    p1 = subprocess.Popen(cmd_srt, stdin=_DEVNULL, stdout=subprocess.PIPE,
+                          close_fds=_CLOSE_FDS, start_new_session=False)
+    p2 = subprocess.Popen(cmd_vtt, stdin=p1.stdout, stdout=subprocess.DEVNULL,
+                          close_fds=_CLOSE_FDS, start_new_session=False)
+    # p2 a sa propre copie : fermer la nôtre pour que p1 reçoive SIGPIPE si p2 s'arrête
+    p1.stdout.close()
+    p2.wait()
+    p1.wait()
+    return (p1.returncode == 0 and p2.returncode == 0
+            and out_vtt.exists() and out_vtt.stat().st_size > 0)
+
+def extract_subtitle_track(input_file, track, total_duration):
+    """
+    Extraction individuelle d'une piste (repli) : WebVTT direct, puis
+    passage par SRT (pipe) si le transcodage direct échoue.
+    Retourne True si le VTT a bien été produit.
+    """
+    label_base = track["label"]
+    out_vtt = track["out_vtt"]
+    if is_direct_subtitle(track):
+        cmd_vtt = ["ffmpeg", "-progress", "pipe:1", "-y", "-fflags", "+genpts", "-i", str(input_file)]
+        cmd_vtt.extend(subtitle_output_args(track))
         try:
-            run_ffmpeg_with_progress(
-                [
-                    "ffmpeg", "-progress", "pipe:1", "-y",
-                    "-i", str(tmp_srt),
-                    "-c:s", "webvtt",
-                    str(out_vtt)
-                ],
-                total_duration,
-                label=f"{label_base} (VTT)"
-            )
+            run_ffmpeg_with_progress(cmd_vtt, total_duration, label=f"{label_base} (VTT)")
+            if out_vtt.exists() and out_vtt.stat().st_size > 0:
+                return True
+            log_warn(label_base, "VTT vide → conversion via SRT...")
         except subprocess.CalledProcessError:
-            log_err(label_base, "conversion VTT échouée → skip")
-            if tmp_srt.exists():
-                try: tmp_srt.unlink()
-                except: pass
-            continue
+            log_warn(label_base, "conversion VTT échouée → conversion via SRT...")
 
-        # cleanup srt
-        if tmp_srt.exists():
-            try: tmp_srt.unlink()
-            except: pass
+    if not convert_subtitle_via_srt_pipe(input_file, track):
+        log_err(label_base, "conversion SRT → VTT échouée → skip")
+        return False
+    return True
 
-        # Nom d'affichage pour le master playlist
-        display_name = f"{lang_code} {sub_type}" if lang_code != "UND" else f"Subtitle {sub_type}"
-        
-        extracted.append({
-            "index": real_index,
-            "path": str(out_vtt),
-            "lang": lang or "",
-            "name": display_name,
-            "forced": is_forced
-        })
-        log_ok(label_base, f"extrait -> {out_vtt.name}")
+# pistes sous-titres ré-extraites en parallèle (process légers, limités par l'I/O)
+SUBTITLE_WORKERS = 4
 
+def collect_subtitles(input_file, tracks, total_duration, batch_ok):
+    """
+    Vérifie les VTT produits par une commande groupée et ré-extrait
+    individuellement les pistes manquantes (toutes si batch_ok est False).
+    Les pistes hors SUBTITLE_CODEC_ARGS ne font jamais partie de la commande
+    groupée : toujours extraites ici (un VTT existant vient d'un run précédent).
+    Retourne les entrées pour le master.
+    """
+    missing = [
+        t for t in tracks
+        if not batch_ok or not is_direct_subtitle(t)
+        or not t["out_vtt"].exists() or t["out_vtt"].stat().st_size == 0
+    ]
+    failed = set()
+    if missing:
+        # pistes indépendantes (un VTT chacune) : pipelines ffmpeg lancés en même temps
+        with ThreadPoolExecutor(max_workers=min(len(missing), SUBTITLE_WORKERS)) as pool:
+            results = pool.map(
+                lambda t: run_in_background(extract_subtitle_track, input_file, t, total_duration),
+                missing
+            )
+            failed = {t["entry"]["index"] for t, ok in zip(missing, results) if not ok}
+
+    extracted = []
+    for t in tracks:
+        if t["entry"]["index"] in failed:
+            continue
+        extracted.append(t["entry"])
+        log_ok(t["label"], f"extrait -> {t['out_vtt'].name}")
     return extracted
 
+def extract_all_subs(input_file, tracks, total_duration):
+    """
+    Extrait les pistes planifiées en VTT, en un seul ffmpeg
+    (plusieurs sorties), avec repli piste par piste en cas d'échec.
+    Utilise run_ffmpeg_with_progress pour afficher la progression.
+    """
+    if not tracks:
+        return []
+
+    # Un seul ffmpeg pour toutes les pistes : le conteneur n'est lu qu'une fois.
+    # Les codecs non gérés en direct sont repris piste par piste par collect_subtitles.
+    direct = [t for t in tracks if is_direct_subtitle(t)]
+    batch_ok = True
+    if direct:
+        cmd_batch = ["ffmpeg", "-progress", "pipe:1", "-y", "-fflags", "+genpts", "-i", str(input_file)]
+        for t in direct:
+            cmd_batch.extend(subtitle_output_args(t))
+        try:
+            run_ffmpeg_with_progress(cmd_batch, total_duration, label=f"Sous-titres x{len(direct)} (VTT)")
+        except subprocess.CalledProcessError:
+            log_warn("Sous-titres", "extraction groupée échouée → extraction piste par piste")
+            batch_ok = False
+
+    return collect_subtitles(input_file, tracks, total_duration, batch_ok)
 
-def generate_audio_playlists(input_file, audio_root, streams):
+
+def plan_audio_tracks(audio_root, streams):
+    """
+    Sélectionne les pistes audio (hors AD) et calcule codec + sorties HLS.
+    """
     # streams est une liste brute -> on filtre les pistes audio
     audio_streams = [s for s in streams if s.get("codec_type") == "audio"]
 
-    entries = []
-
+    tracks = []
     for s in audio_streams:
         # Exclure les pistes audio AD (Audio Description)
         if is_ad_audio(s):
@@ -500,95 +862,112 @@ def generate_audio_playlists(input_file, audio_root, streams):
             title = s.get("tags", {}).get("title", "") or s.get("title", "")
             log_warn(f"Audio #{idx}", f"AD ignoré ({title})")
             continue
-        
+
         idx = s["index"]
         lang = s.get("tags", {}).get("language", "und")
 
         out_dir = audio_root / f"audio_{idx}_{lang}"
-        out_dir.mkdir(parents=True, exist_ok=True)
+        if not out_dir.is_dir():
+            out_dir.mkdir(parents=True)
 
         out_m3u8 = out_dir / f"audio_{idx}_{lang}.m3u8"
         seg_pattern = out_dir / f"audio_{idx}_{lang}_%03d.m4s"
 
-        print(f"\n▶ Audio piste #{idx} ({lang}) : extraction...")
-
         # Déterminer le codec à utiliser selon la source
         audio_config = select_audio_codec(s)
-        codec = audio_config["codec"]
-        bitrate = audio_config.get("bitrate", AUDIO_BITRATE)
-        source_codec = s.get("codec_name", "").lower()
-
-        # obtenir la durée totale pour la barre de progression
-        total_duration = get_duration(input_file) or 0.0
-
-        # Fonction helper pour construire la commande
-        def build_cmd(audio_codec, audio_bitrate=None):
-            cmd = [
-                "ffmpeg", "-progress", "pipe:1", "-y",
-                "-i", input_file,
-                "-map", f"0:{idx}",
-                "-c:a", audio_codec,
-            ]
-            if audio_bitrate:
-                cmd.extend(["-b:a", audio_bitrate])
-            cmd.extend([
-                "-vn",
-                "-f", "hls",
-                "-hls_time", "4",
-                "-hls_playlist_type", "vod",
-                "-hls_segment_type", "fmp4",
-                "-hls_segment_filename", str(seg_pattern),
-                str(out_m3u8)
-            ])
-            return cmd
-
-        # Stratégie : essayer "copy" d'abord si possible, sinon ré-encoder
-        success = False
-        
-        if codec == "copy":
+
+        tracks.append({
+            "index": idx,
+            "lang": lang,
+            "source_codec": s.get("codec_name", "").lower(),
+            "codec": audio_config["codec"],
+            "bitrate": audio_config.get("bitrate", AUDIO_BITRATE),
+            "out_m3u8": out_m3u8,
+            "seg_pattern": seg_pattern,
+            "entry": {
+                "type": "audio",
+                "index": idx,
+                "lang": lang,
+                "playlist": out_m3u8,
+                "name": f"Audio {lang}" if lang != "und" else f"Audio {idx}"
+            }
+        })
+    return tracks
+
+# Partie constante des sorties HLS fmp4 (audio et vidéo), construite une fois ;
+# suivie du motif de segments puis de la playlist
+HLS_MUXER_ARGS = (
+    "-f", "hls",
+    "-hls_time", str(HLS_TIME),
+    "-hls_playlist_type", "vod",
+    "-hls_segment_type", "fmp4",
+    "-hls_segment_filename",
+)
+# GOP fixe de la vidéo (segments HLS alignés entre les qualités)
+VIDEO_GOP_ARGS = ("-g", "48", "-keyint_min", "48", "-an")
+
+def audio_output_args(track, audio_codec, audio_bitrate=None):
+    """
+    Arguments de sortie ffmpeg d'une piste audio HLS fmp4.
+    """
+    args = [
+        "-map", f"0:{track['index']}",
+        "-c:a", audio_codec,
+    ]
+    if audio_bitrate:
+        args.extend(["-b:a", audio_bitrate])
+    if audio_codec != "copy":
+        args.extend(["-threads", "2"])  # largement suffisant pour AAC/EAC3
+    args.append("-vn")
+    args.extend(HLS_MUXER_ARGS)
+    args.append(str(track["seg_pattern"]))
+    args.append(str(track["out_m3u8"]))
+    return args
+
+def audio_track_cmd(input_file, track, audio_codec, audio_bitrate=None):
+    return (["ffmpeg", "-progress", "pipe:1", "-y", "-i", input_file]
+            + audio_output_args(track, audio_codec, audio_bitrate))
+
+def generate_audio_playlists(input_file, tracks, total_duration):
+    """
+    Encode les pistes audio planifiées, toutes en parallèle
+    (copy d'abord si possible, sinon ré-encodage).
+    Les copy en échec sont ensuite ré-encodées en AAC.
+    Retourne les entrées pour le master.
+    """
+    jobs = []
+    for t in tracks:
+        idx = t["index"]
+        if t["codec"] == "copy":
             # Essayer d'abord avec copy (meilleure qualité, aucune perte)
-            log_info(f"Audio #{idx}", f"tentative copy ({source_codec})...")
-            cmd = build_cmd("copy")
-            
-            try:
-                run_ffmpeg_with_progress(cmd, total_duration, f"Audio #{idx} (copy)")
-                success = True
-            except subprocess.CalledProcessError:
-                log_warn(f"Audio #{idx}", "copy échoué, ré-encodage en AAC...")
-                # Si copy échoue, ré-encoder en AAC (compatible HLS fmp4)
-                codec = "aac"
-                bitrate = AUDIO_BITRATE
-        
-        if not success:
-            # Ré-encoder avec le codec approprié
-            if codec == "eac3":
-                log_info(f"Audio #{idx}", f"encodage EAC3 {bitrate}...")
-            else:
-                log_info(f"Audio #{idx}", f"encodage AAC {bitrate}...")
-            
-            cmd = build_cmd(codec, bitrate)
-            
+            log_info(f"Audio #{idx}", f"tentative copy ({t['source_codec']})...")
+            label = f"Audio #{idx} (copy)"
+        else:
+            codec_name = "EAC3" if t["codec"] == "eac3" else "AAC"
+            log_info(f"Audio #{idx}", f"encodage {codec_name} {t['bitrate']}...")
+            label = f"Audio #{idx}"
+        jobs.append((audio_track_cmd(input_file, t, t["codec"], t["bitrate"]), total_duration, label))
+
+    results = run_many_with_progress(jobs)
+
+    entries = []
+    for t, res in zip(tracks, results):
+        idx = t["index"]
+        if isinstance(res, BaseException):
+            if t["codec"] != "copy":
+                log_err(f"Audio #{idx}", "échec encodage → skip")
+                continue
+            # Si copy échoue, ré-encoder en AAC (compatible HLS fmp4)
+            log_warn(f"Audio #{idx}", f"copy échoué, ré-encodage en AAC {AUDIO_BITRATE}...")
             try:
-                run_ffmpeg_with_progress(cmd, total_duration, f"Audio #{idx}")
-                success = True
+                run_ffmpeg_with_progress(audio_track_cmd(input_file, t, "aac", AUDIO_BITRATE),
+                                         total_duration, f"Audio #{idx}")
             except subprocess.CalledProcessError:
                 log_err(f"Audio #{idx}", "échec encodage → skip")
                 continue
-        
-        if not success:
-            log_err(f"Audio #{idx}", "échec → skip")
-            continue
-
-        print(f"✔ Audio piste #{idx} → {out_m3u8.name}")
-
-        entries.append({
-            "type": "audio",
-            "index": idx,
-            "lang": lang,
-            "playlist": out_m3u8,
-            "name": f"Audio {lang}" if lang != "und" else f"Audio {idx}"
-        })
 
+        emit(f"✔ Audio piste #{idx} → {t['out_m3u8'].name}")
+        entries.append(t["entry"])
     return entries
 
 
@@ -600,150 +979,571 @@ def compute_scaled_size_from_width(src_w, src_h, target_w):
     """
     if target_w >= src_w:
         return src_w, src_h
-    ratio = target_w / src_w
-    scaled_w = target_w
-    scaled_h = int(src_h * ratio)
-    # S'assurer que scaled_h est pair (requis par certains codecs)
-    if scaled_h % 2 != 0:
-        scaled_h += 1
-    return scaled_w, scaled_h
+    # arrondi entier au plus proche puis au pair supérieur (requis par certains codecs)
+    scaled_h = ((src_h * target_w + src_w // 2) // src_w + 1) & ~1
+    return target_w, scaled_h
+
+def compute_scaled_size_from_height(src_w, src_h, target_h):
+    """
+    Calcule les dimensions redimensionnées en conservant le ratio d'aspect.
+    target_h est la hauteur cible.
+    """
+    if target_h >= src_h:
+        return src_w, src_h
+    # arrondi entier au plus proche puis au pair supérieur (requis par certains codecs)
+    scaled_w = ((src_w * target_h + src_h // 2) // src_h + 1) & ~1
+    return scaled_w, target_h
+
+# Ordre de préférence des méthodes de décodage matériel
+HWACCEL_PREFERENCE = ("cuda", "qsv", "vaapi", "videotoolbox", "d3d11va", "dxva2")
+
+def hwaccel_device_works(method):
+    """
+    True si un device de cette méthode s'ouvre vraiment sur cette machine.
+    ffmpeg -hwaccels liste les méthodes compilées, pas le matériel présent :
+    un -hwaccel explicite sans device fait échouer l'ouverture du décodeur.
+    """
+    try:
+        p = subprocess.run(_stringify([
+            "ffmpeg", "-hide_banner", "-v", "error",
+            "-init_hw_device", method,
+            "-f", "lavfi", "-i", "nullsrc", "-frames:v", "1", "-f", "null", "-"
+        ]), stdin=_DEVNULL, capture_output=True, timeout=15,
+            close_fds=_CLOSE_FDS, start_new_session=False)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return p.returncode == 0
+
+@functools.lru_cache(maxsize=None)
+def detect_hwaccel():
+    """
+    Retourne la méthode -hwaccel à utiliser, ou None : la première de
+    HWACCEL_PREFERENCE compilée dans ffmpeg (ffmpeg -hwaccels) et dont
+    le device s'ouvre (hwaccel_device_works).
+    Détectée une seule fois par process.
+    """
+    if not USE_HWACCEL:
+        return None
+    try:
+        p = subprocess.run(_stringify(["ffmpeg", "-hide_banner", "-hwaccels"]),
+                           stdin=_DEVNULL, capture_output=True, text=True, check=True,
+                           close_fds=_CLOSE_FDS, start_new_session=False)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    # première ligne = "Hardware acceleration methods:"
+    available = {line.strip() for line in p.stdout.splitlines()[1:] if line.strip()}
+    for method in HWACCEL_PREFERENCE:
+        if method in available and hwaccel_device_works(method):
+            return method
+    return None
+
+# Filtres de redimensionnement GPU par méthode -hwaccel
+# (fmt = nv12 pour les sources 8 bits, p010 au-delà pour garder le 10 bits)
+HW_SCALE_FILTERS = {
+    "cuda": "scale_cuda={w}:{h}:format={fmt}",
+    "qsv": "scale_qsv=w={w}:h={h}:format={fmt}",
+    "vaapi": "scale_vaapi=w={w}:h={h}:format={fmt}",
+}
+
+def hw_frame_format(src_bit_depth):
+    return "p010" if src_bit_depth > 8 else "nv12"
+
+def hwscale_method():
+    """
+    Méthode -hwaccel utilisable aussi pour le redimensionnement, ou None.
+    """
+    if not USE_HWSCALE:
+        return None
+    hwaccel = detect_hwaccel()
+    return hwaccel if hwaccel in HW_SCALE_FILTERS else None
 
-def encode_video_quality(input_file, out_dir, label, target_w, bitrate, src_w, src_h):
+def hwaccel_input_args(hwscale=False):
+    """
+    Options à placer avant -i pour décoder la source sur GPU.
+    Sans -hwaccel_output_format, ffmpeg rapatrie les frames en mémoire système :
+    le scale CPU et libsvtav1 restent inchangés, et ffmpeg repasse en
+    décodage logiciel si le codec source n'est pas supporté par le device.
+    Avec hwscale, les frames restent sur le GPU jusqu'au filtre de scale_filter.
     """
-    Encode une qualité video-only AV1 dans out_dir.
-    Retourne un dict avec playlist + bandwidth + resolution.
-    target_w est la largeur cible (LADDER contient des largeurs).
+    hwaccel = detect_hwaccel()
+    if not hwaccel:
+        return []
+    if hwscale:
+        return ["-hwaccel", hwaccel, "-hwaccel_output_format", hwaccel]
+    return ["-hwaccel", hwaccel]
+
+def scale_filter(scaled_w, scaled_h, hwscale=None, hw_format="nv12"):
     """
-    input_file = Path(input_file)
-    out_dir = Path(out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
+    Filtre de redimensionnement d'une branche : swscale (garde le pix_fmt
+    source), ou filtre GPU en hw_format suivi du rapatriement des frames
+    pour libsvtav1.
+    """
+    if hwscale:
+        scale = HW_SCALE_FILTERS[hwscale].format(w=scaled_w, h=scaled_h, fmt=hw_format)
+        return f"{scale},hwdownload,format={hw_format}"
+    return f"scale={scaled_w}:{scaled_h}"
 
-    playlist = out_dir / f"{label}.m3u8"
+def plan_ladder(src_w, src_h, ladder_mode="width"):
+    """
+    Retourne les qualités à encoder : liste triée de (label, scaled_w, scaled_h).
+    ladder_mode choisit LADDER_WIDTH ("width") ou LADDER_HEIGHT ("height").
+    Ignore les qualités plus grandes que la source et celles à moins de 5%
+    d'une qualité déjà retenue (quasi-doublons qui gaspillent du débit).
+    """
+    if ladder_mode == "height":
+        ladder, src_dim, dim_name = LADDER_HEIGHT, src_h, "hauteur"
+        scale = compute_scaled_size_from_height
+    else:
+        ladder, src_dim, dim_name = LADDER_WIDTH, src_w, "largeur"
+        scale = compute_scaled_size_from_width
+
+    planned = []
+    for label, target in sorted(ladder.items(), key=lambda x: x[1], reverse=True):
+        if target > src_dim:
+            log_info(f"Vidéo {label}", f"ignorée ({target} > {dim_name} source {src_dim})")
+            continue
+        scaled_w, scaled_h = scale(src_w, src_h, target)
+        if planned and planned[-1][1] / scaled_w < 1.05:
+            log_info(f"Vidéo {label}", f"ignorée (quasi identique à {planned[-1][0]})")
+            continue
+        planned.append((label, scaled_w, scaled_h))
+    planned.reverse()
+    return planned
+
+def svtav1_params(profile, threads):
+    params = (
+        f"tile-columns={profile['tile_cols']}:tile-rows={profile['tile_rows']}"
+        f":lp={threads}:pin=0:fast-decode=1"
+    )
+    if profile.get("lookahead") is not None:
+        params += f":lookahead={profile['lookahead']}"
+    return params
+
+def build_rendition_args(out_dir, label, scaled_w, scaled_h, profile, threads=AVAILABLE_CPUS):
+    """
+    Arguments de sortie libsvtav1/HLS d'une qualité (sans -map ni filtre),
+    partagés par l'encodage par qualité et le single-pass.
+    profile est l'entrée PROFILES de la qualité (débit, preset, tuiles).
+    Retourne (args, entry) où entry contient playlist + bandwidth + resolution.
+    threads = nombre de threads SVT-AV1 (lp), réduit quand plusieurs qualités tournent en parallèle.
+    """
+    if not out_dir.is_dir():
+        out_dir.mkdir(parents=True)
+
+    playlist = str(out_dir / f"{label}.m3u8")
     segment_pat = out_dir / f"{label}_%03d.m4s"
-    scaled_w, scaled_h = compute_scaled_size_from_width(src_w, src_h, target_w)
 
+    bitrate = profile["bitrate"]
+    args = [
+        "-c:v", "libsvtav1",
+        "-preset", str(profile["preset"]),
+        "-svtav1-params", svtav1_params(profile, threads),
+        "-threads", str(threads),
+        "-b:v", bitrate,
+        *VIDEO_GOP_ARGS,
+        *HLS_MUXER_ARGS, str(segment_pat),
+        playlist
+    ]
+
+    entry = {
+        "label": label,
+        "playlist": playlist,
+        "bandwidth": int(bitrate.replace("k", "")) * 1000,
+        "resolution": f"{scaled_w}x{scaled_h}"
+    }
+    return args, entry
+
+def build_video_quality_cmd(input_file, out_dir, label, scaled_w, scaled_h, profile, threads=AVAILABLE_CPUS):
+    """
+    Construit la commande ffmpeg (avec -progress) d'une qualité video-only AV1,
+    en décodage logiciel (dernier repli, sans -hwaccel).
+    Retourne (cmd, entry).
+    """
+    args, entry = build_rendition_args(out_dir, label, scaled_w, scaled_h, profile, threads)
     cmd = [
-        "ffmpeg", "-y",
+        "ffmpeg", "-progress", "pipe:1", "-y",
         "-i", str(input_file),
         "-map", "0:v:0",
         "-vf", f"scale={scaled_w}:{scaled_h}",
-        "-c:v", "libsvtav1",
-        "-preset", PRESET,
-        "-b:v", bitrate,
-        "-g", "48", "-keyint_min", "48",
-        "-an",
-        "-f", "hls",
-        "-hls_time", str(HLS_TIME),
-        "-hls_playlist_type", "vod",
-        "-hls_segment_type", "fmp4",
-        "-hls_segment_filename", str(segment_pat),
-        str(playlist)
-    ]
-    duration = get_duration(str(input_file)) or 0.0
+    ] + args
+    return cmd, entry
+
+def encode_video_ladder_parallel(input_file, video_root, ladder_subset, duration):
+    """
+    Fallback : encode chaque qualité dans son propre process ffmpeg, en parallèle.
+    ladder_subset est une liste de (label, scaled_w, scaled_h).
+    Les qualités en échec sont ignorées.
+    """
+    n_parallel = max(1, min(len(ladder_subset), AVAILABLE_CPUS // 2))
+    # répartir les cœurs entre les encodes pour éviter la sur-souscription SVT-AV1
+    threads = max(1, AVAILABLE_CPUS // n_parallel)
+
+    jobs = []
+    planned_entries = []
+    for label, scaled_w, scaled_h in ladder_subset:
+        cmd, entry = build_video_quality_cmd(input_file, video_root / label, label,
+                                             scaled_w, scaled_h, PROFILES[label], threads)
+        jobs.append((cmd, duration, f"Vidéo {label}"))
+        planned_entries.append(entry)
+
+    # fenêtre glissante de n_parallel encodes : durée totale ≈ max(τ_i) et non Σ τ_i
+    results = run_many_with_progress(jobs, max_parallel=n_parallel)
+
+    entries = []
+    for entry, res in zip(planned_entries, results):
+        if isinstance(res, BaseException):
+            print(f"⚠️ Encodage {entry['label']} échoué, on continue")
+            continue
+        entries.append(entry)
+    return entries
+
+def video_ladder_args(video_root, ladder_subset, profiles, hwscale=None, hw_format="nv12"):
+    """
+    Construit le filter_complex (split=N puis un scale par branche) et les
+    sorties libsvtav1/HLS de chaque qualité.
+    ladder_subset est une liste de (label, scaled_w, scaled_h).
+    hwscale = méthode GPU du redimensionnement (voir hwscale_method), None = swscale ;
+    hw_format = format des frames GPU (voir hw_frame_format).
+    Retourne (filter_complex, output_args, entries).
+    """
 
-    cmd_progress = cmd.copy()
-    cmd_progress.insert(1, "-progress")
-    cmd_progress.insert(2, "pipe:1")
+    k = len(ladder_subset)
+    # les k encodeurs SVT-AV1 du même process se partagent les cœurs
+    threads = max(1, AVAILABLE_CPUS // k)
+    # une seule qualité : pas de split, le scale lit directement la source
+    if k == 1:
+        graph, inputs = [], ["[0:v:0]"]
+    else:
+        graph = [f"[0:v:0]split={k}" + "".join(f"[v{i}]" for i in range(k))]
+        inputs = [f"[v{i}]" for i in range(k)]
+    outputs = []
+    entries = []
+    for i, (label, scaled_w, scaled_h) in enumerate(ladder_subset):
+        graph.append(f"{inputs[i]}{scale_filter(scaled_w, scaled_h, hwscale, hw_format)}[o{i}]")
+        args, entry = build_rendition_args(video_root / label, label, scaled_w, scaled_h,
+                                           profiles[label], threads)
+        outputs.extend(["-map", f"[o{i}]"])
+        outputs.extend(args)
+        entries.append(entry)
+
+    return ";".join(graph), outputs, entries
+
+def encode_video_ladder_single_pass(input_file, video_root, ladder_subset, profiles, duration):
+    """
+    Encode toutes les qualités en un seul process ffmpeg :
+    la source est décodée une fois puis dupliquée via split=N,
+    chaque branche est redimensionnée et encodée par son propre libsvtav1.
+    Repli de la commande unique : décodage logiciel, sans -hwaccel.
+    ladder_subset est une liste de (label, scaled_w, scaled_h).
+    Retourne la liste des dicts (playlist + bandwidth + resolution).
+    """
+    graph, outputs, entries = video_ladder_args(video_root, ladder_subset, profiles)
+    cmd = [
+        "ffmpeg", "-progress", "pipe:1", "-y",
+        "-i", str(input_file),
+        "-filter_complex", graph,
+    ] + outputs
 
+    labels = "+".join(label for label, _, _ in ladder_subset)
     try:
-        run_ffmpeg_with_progress(cmd_progress, duration, label=f"Vidéo {label}")
+        run_ffmpeg_with_progress(cmd, duration, label=f"Vidéo {labels}")
     except subprocess.CalledProcessError:
-        log_err(f"Vidéo {label}", "échec encodage → skip")
+        log_err(f"Vidéo {labels}", "échec encodage single-pass")
         raise
 
-    return {
-        "label": label,
-        "playlist": str(playlist),
-        "bandwidth": int(bitrate.replace("k", "")) * 1000,
-        "resolution": f"{scaled_w}x{scaled_h}"
-    }
+    return entries
 
-def append_master_video(master_path, entry):
+def encode_video_ladder(input_file, video_root, ladder_subset, duration):
     """
-    Ajoute une entrée EXT-X-STREAM-INF au master.
+    Encode les qualités en single-pass, repli sur un encodage par qualité.
     """
-    master_path = Path(master_path)
-    with open(master_path, "a", encoding="utf-8") as f:
-        f.write(
-            f'#EXT-X-STREAM-INF:BANDWIDTH={entry["bandwidth"]},'
-            f'RESOLUTION={entry["resolution"]},AUDIO="audio",SUBTITLES="subs"\n'
-        )
-        rel = os.path.relpath(entry["playlist"], start=str(master_path.parent))
-        f.write(f"{rel}\n\n")
-
-def write_master_header(master_path, audio_entries, subtitle_entries):
-    master_path = Path(master_path)
-    master_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(master_path, "w", encoding="utf-8") as m:
-        m.write("#EXTM3U\n\n")
+    if not ladder_subset:
+        return []
+    try:
+        return encode_video_ladder_single_pass(input_file, video_root, ladder_subset, PROFILES, duration)
+    except subprocess.CalledProcessError:
+        log_warn("Vidéo", "single-pass échoué → encodage par qualité en parallèle")
+        return encode_video_ladder_parallel(input_file, video_root, ladder_subset, duration)
+
+def assemble_full_cmd(input_file, sub_tracks, audio_tracks, video_root, ladder_subset, src_bit_depth=8):
+    """
+    Construit la commande ffmpeg unique du fichier : la source est lue une fois
+    et alimente les qualités vidéo (split), les pistes audio et les sous-titres.
+    Retourne (cmd, video_entries), cmd = None s'il n'y a aucune sortie.
+    """
+    if not (ladder_subset or audio_tracks or sub_tracks):
+        return None, []
+
+    # seule la commande unique décode / redimensionne sur GPU : les reprises
+    # (encode_by_stage) restent entièrement en logiciel
+    hwscale = hwscale_method() if ladder_subset else None
+    cmd = [
+        "ffmpeg", "-progress", "pipe:1", "-y",
+        *hwaccel_input_args(hwscale is not None),
+        "-i", str(input_file),
+    ]
+    video_entries = []
+    if ladder_subset:
+        graph, outputs, video_entries = video_ladder_args(video_root, ladder_subset, PROFILES, hwscale,
+                                                          hw_frame_format(src_bit_depth))
+        cmd.extend(["-filter_complex", graph])
+        cmd.extend(outputs)
+    for t in audio_tracks:
+        cmd.extend(audio_output_args(t, t["codec"], t["bitrate"]))
+    for t in sub_tracks:
+        cmd.extend(subtitle_output_args(t))
+    return cmd, video_entries
+
+def encode_all_single_pass(input_file, sub_tracks, audio_tracks, video_root, ladder_subset, duration,
+                           src_bit_depth=8):
+    """
+    Exécute la commande unique (assemble_full_cmd).
+    Retourne (subs, audio_entries, video_entries).
+    Raises CalledProcessError : l'appelant repasse alors en encodage par étape.
+    """
+    cmd, video_entries = assemble_full_cmd(input_file, sub_tracks, audio_tracks, video_root, ladder_subset,
+                                           src_bit_depth)
+    if cmd is None:
+        return [], [], []
+
+    # playlists d'un run précédent supprimées : en cas d'échec, encode_by_stage
+    # ne doit considérer comme terminées que les sorties écrites par ce run
+    for playlist in [e["playlist"] for e in video_entries] + [t["out_m3u8"] for t in audio_tracks]:
+        try:
+            os.unlink(playlist)
+        except FileNotFoundError:
+            pass
+
+    run_ffmpeg_with_progress(cmd, duration, label="Vidéo + audio + sous-titres")
+
+    subs = collect_subtitles(input_file, sub_tracks, duration, batch_ok=True)
+    return subs, [t["entry"] for t in audio_tracks], video_entries
+
+def hls_playlist_complete(playlist):
+    """
+    True si la playlist VOD est finalisée (#EXT-X-ENDLIST écrit en fin d'encodage).
+    """
+    try:
+        with open(playlist, "rb") as f:
+            # taille lue sur le fd ouvert : playlist peut être un str ou un Path
+            f.seek(max(0, os.fstat(f.fileno()).st_size - 64))
+            return b"#EXT-X-ENDLIST" in f.read()
+    except OSError:
+        return False
+
+def encode_missing_audio(input_file, audio_tracks, duration):
+    """
+    Encode les pistes audio non terminées, ordre d'origine conservé.
+    Retourne les entrées audio pour le master.
+    """
+    audio_todo = [t for t in audio_tracks if not hls_playlist_complete(t["out_m3u8"])]
+    for t in audio_tracks:
+        if t not in audio_todo:
+            log_ok(f"Audio #{t['index']}", "déjà produit par la commande unique")
+    done = {e["index"] for e in generate_audio_playlists(input_file, audio_todo, duration)}
+    done.update(t["index"] for t in audio_tracks if t not in audio_todo)
+    return [t["entry"] for t in audio_tracks if t["index"] in done]
+
+def encode_missing_video(input_file, video_root, ladder_subset, duration):
+    """
+    Encode les qualités vidéo non terminées.
+    Retourne les entrées vidéo pour le master.
+    """
+    print("\n--- Encodage vidéos ---")
+    video_entries = []
+    video_todo = []
+    for rung in ladder_subset:
+        label, scaled_w, scaled_h = rung
+        _, entry = build_rendition_args(video_root / label, label, scaled_w, scaled_h, PROFILES[label])
+        if hls_playlist_complete(entry["playlist"]):
+            log_ok(f"Vidéo {label}", "déjà produite par la commande unique")
+            video_entries.append(entry)
+        else:
+            video_todo.append(rung)
+    video_entries.extend(encode_video_ladder(input_file, video_root, video_todo, duration))
+    return video_entries
+
+def encode_by_stage(input_file, sub_tracks, audio_tracks, video_root, ladder_subset, duration):
+    """
+    Repli après échec de la commande unique : ne refait que les sorties
+    non finalisées (playlists HLS sans #EXT-X-ENDLIST), étape par étape.
+    Les sous-titres (sans marqueur de fin) sont tous ré-extraits.
+    Retourne (subs, audio_entries, video_entries).
+    """
+
+    # 1) + 2) sous-titres et audio en arrière-plan (sorties dans des dossiers
+    # distincts), pendant que les encodes vidéo occupent les cœurs ;
+    # leurs logs sont affichés une fois la vidéo terminée
+    print("\n--- Sous-titres + audio (arrière-plan, logs en fin d'étape) ---")
+    with defer_background_logs(), ThreadPoolExecutor(max_workers=2) as pool:
+        subs_future = pool.submit(run_in_background, extract_all_subs,
+                                  input_file, sub_tracks, duration)
+        audio_future = pool.submit(run_in_background, encode_missing_audio,
+                                   input_file, audio_tracks, duration)
+        video_entries = encode_missing_video(input_file, video_root, ladder_subset, duration)
+        subs = subs_future.result()
+        audio_entries = audio_future.result()
+
+    return subs, audio_entries, video_entries
+
+@functools.lru_cache(maxsize=512)
+def master_relpath(playlist, master_dir):
+    # cas courant : la playlist a été construite sous le dossier du master,
+    # un découpage de préfixe suffit (pas de normalisation ni de cwd)
+    prefix = master_dir + os.sep
+    if playlist.startswith(prefix):
+        return playlist[len(prefix):]
+    return os.path.relpath(playlist, start=master_dir)
+
+class MasterBuilder:
+    """
+    Master playlist construit en mémoire (en-tête audio + subtitles, puis
+    une entrée par qualité vidéo), publié en une seule écriture atomique.
+    """
+    def __init__(self, master_path):
+        self.master_path = master_path
+        self.master_dir = str(master_path.parent)
+        self.lines = ["#EXTM3U\n\n"]
+
+    def rel(self, playlist):
+        return master_relpath(str(playlist), self.master_dir)
+
+    def add_header(self, audio_entries, subtitle_entries):
+        lines = self.lines
         # audio tracks
         for idx, a in enumerate(audio_entries):
-            rel = os.path.relpath(a["playlist"], start=str(master_path.parent))
             default = "YES" if idx == 0 else "NO"
             autoselect = "YES" if idx == 0 else "NO"
-            m.write(
+            lines.append(
                 f'#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio",NAME="{a["name"]}",'
-                f'LANGUAGE="{a["lang"]}",DEFAULT={default},AUTOSELECT={autoselect},URI="{rel}"\n'
+                f'LANGUAGE="{a["lang"]}",DEFAULT={default},AUTOSELECT={autoselect},URI="{self.rel(a["playlist"])}"\n'
             )
-        m.write("\n")
+        lines.append("\n")
         # subtitles
         for s in subtitle_entries:
-            rel = os.path.relpath(s["path"], start=str(master_path.parent))
             forced_flag = "YES" if s.get("forced", False) else "NO"
-            m.write(
+            lines.append(
                 f'#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",NAME="{s["name"]}",'
-                f'LANGUAGE="{s["lang"]}",DEFAULT=NO,AUTOSELECT=NO,FORCED={forced_flag},URI="{rel}"\n'
+                f'LANGUAGE="{s["lang"]}",DEFAULT=NO,AUTOSELECT=NO,FORCED={forced_flag},URI="{self.rel(s["path"])}"\n'
             )
-        m.write("\n")
+        lines.append("\n")
+
+    def add_video(self, entry):
+        """
+        Ajoute une entrée EXT-X-STREAM-INF au master.
+        """
+        self.lines.append(
+            f'#EXT-X-STREAM-INF:BANDWIDTH={entry["bandwidth"]},'
+            f'RESOLUTION={entry["resolution"]},AUDIO="audio",SUBTITLES="subs"\n'
+            f'{self.rel(entry["playlist"])}\n\n'
+        )
+
+    def write(self):
+        """
+        Écrit le master d'un coup via un fichier temporaire + rename :
+        un lecteur ne voit jamais de master partiel.
+        """
+        parent = self.master_path.parent
+        if not parent.is_dir():
+            parent.mkdir(parents=True)
+        tmp = self.master_path.with_name(self.master_path.name + ".tmp")
+        tmp.write_text("".join(self.lines), encoding="utf-8")
+        os.replace(tmp, self.master_path)
+
+def limit_cpus(n):
+    """
+    Réduit le budget de cœurs de ce process (plusieurs films encodés en parallèle).
+    """
+    global AVAILABLE_CPUS
+    AVAILABLE_CPUS = max(1, min(n, AVAILABLE_CPUS))
+
+def process_file(file, ladder_mode="width"):
+    """
+    Encode un fichier source complet (vidéo, audio, sous-titres, master)
+    dans OUTPUT_DIR/<stem>/.
+    """
+    print(f"\n=== Traitement : {file} ===")
+    base = file.stem
+    output_root = OUTPUT_DIR / base
+    video_root = output_root / "video"
+    audio_root = output_root / "audio"
+    subs_root = output_root / "subtitles"
+
+    for d in [video_root, audio_root, subs_root]:
+        if not d.is_dir():
+            d.mkdir(parents=True)
+
+    streams = ffprobe_streams(file)
+    src_w, src_h = get_video_resolution(streams)
+    print("Résolution source :", src_w, "x", src_h)
+
+    sub_tracks = plan_subtitle_tracks(subs_root, streams)
+    audio_tracks = plan_audio_tracks(audio_root, streams)
+    planned = plan_ladder(src_w, src_h, ladder_mode)
+    duration = get_duration(file) or 0.0
+    bit_depth = get_video_bit_depth(streams)
+
+    # 1) tout en une commande : un seul demux de la source
+    print("\n--- Encodage vidéo / audio / sous-titres ---")
+    try:
+        subs, audio_entries, video_entries = encode_all_single_pass(
+            file, sub_tracks, audio_tracks, video_root, planned, duration, bit_depth
+        )
+    except subprocess.CalledProcessError:
+        log_warn("Encodage", "commande unique échouée → reprise des sorties manquantes")
+        subs, audio_entries, video_entries = encode_by_stage(
+            file, sub_tracks, audio_tracks, video_root, planned, duration
+        )
+
+    # master header (audio + subtitles), gardé en mémoire
+    master_path = output_root / "master.m3u8"
+    master = MasterBuilder(master_path)
+    master.add_header(audio_entries, subs)
+
+    # master trié par bandwidth, écrit en une fois une fois les encodes terminés
+    for entry in sorted(video_entries, key=lambda e: e["bandwidth"]):
+        master.add_video(entry)
+        print(f"✅ {entry['label']} ajouté au master.")
+    master.write()
+    print(f"\nMaster créé : {master_path}")
+
+    print(f"\n✔ Terminé : {output_root}")
+
+def list_input_files(input_dir=INPUT_DIR):
+    """
+    Fichiers de input_dir triés par nom (os.scandir : le type vient de la
+    lecture du dossier, pas d'un stat par entrée).
+    """
+    try:
+        with os.scandir(input_dir) as it:
+            files = [Path(e.path) for e in it if e.is_file()]
+    except FileNotFoundError:
+        return []
+    files.sort(key=lambda p: p.name)
+    return files
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Encode des fichiers vidéo en HLS AV1 (fmp4).")
+    parser.add_argument("input", nargs="?", type=Path,
+                        help="fichier à encoder (par défaut : tout ./input/)")
+    parser.add_argument("--ladder-mode", choices=("width", "height"), default="width",
+                        help="paliers définis par largeur (LADDER_WIDTH) ou hauteur (LADDER_HEIGHT)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Si un fichier est passé en argument → on encode seulement celui-là
+    if args.input:
+        input_files = [args.input]
+    else:
+        input_files = list_input_files()
 
-def main():
     if not input_files:
         print("Aucun fichier trouvé dans ./input/")
         return
 
     for file in input_files:
-        print(f"\n=== Traitement : {file} ===")
-        base = file.stem
-        output_root = OUTPUT_DIR / base
-        video_root = output_root / "video"
-        audio_root = output_root / "audio"
-        subs_root = output_root / "subtitles"
-
-        for d in [video_root, audio_root, subs_root]:
-            d.mkdir(parents=True, exist_ok=True)
-
-        streams = ffprobe_streams(str(file))
-        src_w, src_h = get_video_resolution(streams)
-        print("Résolution source :", src_w, "x", src_h)
-
-        # 1) subtitles
-        print("\n--- Extraction sous-titres ---")
-        subs = extract_all_subs(str(file), subs_root, streams)
-
-        # 2) audio
-        print("\n--- Encodage audio / packaging ---")
-        audio_entries = generate_audio_playlists(str(file), audio_root, streams)
-
-        # 3) master header (audio + subtitles)
-        master_path = output_root / "master.m3u8"
-        write_master_header(master_path, audio_entries, subs)
-        print(f"\nMaster initial créé : {master_path}")
-
-        # 4) encode video qualities and append to master progressively
-        print("\n--- Encodage vidéos ---")
-        for label, target_w in sorted(LADDER.items(), key=lambda x: x[1]):
-            if target_w > src_w:
-                continue
-            out_dir = video_root / label
-            try:
-                entry = encode_video_quality(str(file), out_dir, label, target_w, BITRATES[label], src_w, src_h)
-            except Exception:
-                print(f"⚠️ Encodage {label} échoué, on continue")
-                continue
-            append_master_video(master_path, entry)
-            print(f"✅ {label} ajouté au master.")
-
-        print(f"\n✔ Terminé : {output_root}")
+        process_file(file, args.ladder_mode)
 
 if __name__ == "__main__":
     main()
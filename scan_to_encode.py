@@ -1,27 +1,50 @@
 #!/usr/bin/env python3
 import os
-import subprocess
-from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-INPUT_DIR = Path("input")
-OUTPUT_DIR = Path("output")
+import encode_hls_av1
+from encode_hls_av1 import INPUT_DIR, OUTPUT_DIR
+
+# cœurs SVT-AV1 alloués à chaque film encodé en parallèle
+JOB_CPUS = 8
+
+def init_worker(cpus, quiet):
+    """
+    Initialise un process worker : budget de cœurs, et sans barres de
+    progression si plusieurs films s'affichent sur le même terminal.
+    """
+    encode_hls_av1.limit_cpus(cpus)
+    if quiet:
+        encode_hls_av1.hide_progress()
 
 def main():
-    for file in INPUT_DIR.glob("*"):
-        base = file.stem
-        output_path = OUTPUT_DIR / base
+    # stems déjà encodés, lus en une passe sur OUTPUT_DIR
+    try:
+        with os.scandir(OUTPUT_DIR) as it:
+            done = {e.name for e in it}
+    except FileNotFoundError:
+        done = set()
 
-        if output_path.exists():
+    todo = []
+    for file in encode_hls_av1.list_input_files(INPUT_DIR):
+        if file.stem in done:
             print(f"▶ Déjà encodé : {file.name}")
             continue
+        todo.append(file)
 
-        print(f"\n=== Nouvel encodage : {file.name} ===")
-
-        subprocess.run([
-            "python3",
-            "encode_hls_av1.py",
-            str(file)   # ⬅ FIX : on passe le fichier !
-        ], check=True)
+    if todo:
+        workers = max(1, min(len(todo), encode_hls_av1.AVAILABLE_CPUS // JOB_CPUS))
+        cpus = max(1, encode_hls_av1.AVAILABLE_CPUS // workers)
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=init_worker,
+                                 initargs=(cpus, workers > 1)) as pool:
+            futures = {pool.submit(encode_hls_av1.process_file, file): file for file in todo}
+            for fut in as_completed(futures):
+                file = futures[fut]
+                try:
+                    fut.result()
+                except Exception as e:
+                    encode_hls_av1.log_err(file.name, f"échec encodage : {e}")
 
     print("\n✔ Vérification terminée.")
 